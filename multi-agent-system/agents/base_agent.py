@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 import streamlit as st
+from utils.state_manager import AgentState
 
 class BaseAgent(ABC):
     def __init__(self, name: str, client, state_manager):
@@ -8,6 +9,8 @@ class BaseAgent(ABC):
         self.client = client
         self.state_manager = state_manager
         self.capabilities = []
+        # Key into st.session_state.agent_states, computed once
+        self._state_key = name.lower().replace(' ', '_')
     
     @abstractmethod
     def can_handle(self, input_type: str, has_image: bool = False) -> bool:
@@ -19,20 +22,31 @@ class BaseAgent(ABC):
         """Process the user input and return response"""
         pass
     
+    async def aprocess(self, user_input: str, image_data: Optional[Any] = None) -> str:
+        """Async variant of process; agents override this to await Gemini directly"""
+        return self.process(user_input, image_data)
+    
+    def stream(self, user_input: str, image_data: Optional[Any] = None) -> Iterator[str]:
+        """Stream the response in chunks; agents override this to stream from Gemini"""
+        yield self.process(user_input, image_data)
+    
     def get_capabilities(self) -> list:
         """Return list of agent capabilities"""
         return self.capabilities
     
     def log_action(self, action: str, details: str = ""):
         """Log agent action"""
-        st.write(f"🤖 **{self.name}**: {action}")
-        if details:
-            st.write(f"   *{details}*")
+        # One markdown element per log line; the trailing double space is a line break
+        st.markdown(f"🤖 **{self.name}**: {action}" + (f"  \n*{details}*" if details else ""))
     
     def update_state(self, state_data: Dict[str, Any]):
         """Update agent's state"""
-        self.state_manager.update_agent_state(self.name.lower().replace(' ', '_'), state_data)
+        self.state_manager.update_agent_state(self._state_key, state_data)
     
-    def get_state(self) -> Dict[str, Any]:
+    def get_state(self) -> AgentState:
         """Get agent's current state"""
-        return self.state_manager.get_agent_state(self.name.lower().replace(' ', '_'))
\ No newline at end of file
+        return self.state_manager.get_agent_state(self._state_key)
+    
+    def is_active(self) -> bool:
+        """Whether the agent's last run succeeded"""
+        return self.get_state().active
@@ -1,12 +1,29 @@
 from .base_agent import BaseAgent
 from .text_agent import TextAgent
 from .vision_agent import VisionAgent
-from typing import Any, Optional, List
+from typing import Any, Iterator, Optional, List
+import asyncio
+import math
+import re
 import streamlit as st
 
 class CoordinatorAgent(BaseAgent):
+    _TOKEN_RE = re.compile(r'\w+')
+    # Multi-part queries (several questions, follow-ups, lists) still get the two-agent path
+    _COMPOSITE_QUERY_RE = re.compile(
+        r'\?.*\S.*\?|\b(also|additionally|as well as|and then)\b|^\s*(\d+[.)]|[-*•])\s',
+        re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Skip the synthesis call when the vision answer is substantial and covers
+    # at least this fraction of the query's words
+    _SYNTHESIS_MIN_VISION_CHARS = 300
+    _SYNTHESIS_MIN_OVERLAP = 0.6
+    
     def __init__(self, client, state_manager):
         super().__init__("Coordinator Agent", client, state_manager)
+        # Built eagerly: the coordinator is shared by every session, so deferring
+        # construction would save nothing per session and only muddy status reporting
         self.text_agent = TextAgent(client, state_manager)
         self.vision_agent = VisionAgent(client, state_manager)
         self.capabilities = [
@@ -16,6 +33,12 @@ class CoordinatorAgent(BaseAgent):
             "Handle complex multi-modal inputs",
             "Maintain system state"
         ]
+        # Capabilities never change after construction, so build the summary once
+        self._capabilities_summary = {
+            'coordinator': self.capabilities,
+            'text_agent': self.text_agent.capabilities,
+            'vision_agent': self.vision_agent.capabilities
+        }
     
     def can_handle(self, input_type: str, has_image: bool = False) -> bool:
         """Coordinator can handle all types of inputs"""
@@ -23,13 +46,20 @@ class CoordinatorAgent(BaseAgent):
     
     def process(self, user_input: str, image_data: Optional[Any] = None) -> str:
         """Coordinate processing between agents"""
+        return "".join(self.stream(user_input, image_data))
+    
+    def stream(self, user_input: str, image_data: Optional[Any] = None) -> Iterator[str]:
+        """Coordinate processing and stream the final response.
+        
+        Routing and logging happen eagerly so they render before the streamed answer.
+        """
         try:
             # Determine input characteristics
             has_image = image_data is not None
             input_type = self._determine_input_type(user_input, has_image)
             
             # Route to appropriate agent(s)
-            response = self._route_request(user_input, image_data, input_type, has_image)
+            chunks = self._route_request(user_input, image_data, input_type, has_image)
             
             # Update coordinator state
             self.update_state({
@@ -38,60 +68,106 @@ class CoordinatorAgent(BaseAgent):
                 'last_routing': self._get_routing_info(input_type, has_image)
             })
             
-            return response
+            return chunks
             
         except Exception as e:
             error_msg = f"Coordinator error: {str(e)}"
             self.update_state({'last_decision': 'error', 'active': False})
-            return error_msg
+            return iter([error_msg])
     
     def _determine_input_type(self, user_input: str, has_image: bool) -> str:
         """Determine the type of input and processing needed"""
         if has_image:
-            # Check if the text query is image-related
-            image_keywords = ['image', 'picture', 'photo', 'see', 'look', 'visual', 'describe', 'analyze', 'identify', 'what is', 'what are']
-            if any(keyword in user_input.lower() for keyword in image_keywords) or not user_input.strip():
-                return "vision_primary"
-            else:
+            # Multi-part queries are checked first so they always get the two-agent path;
+            # anything else about the image is answered by one multi-modal call
+            if self._COMPOSITE_QUERY_RE.search(user_input) is not None:
                 return "vision_with_text"
+            else:
+                return "vision_primary"
         else:
             return "text_only"
     
-    def _route_request(self, user_input: str, image_data: Optional[Any], input_type: str, has_image: bool) -> str:
+    def _route_request(self, user_input: str, image_data: Optional[Any], input_type: str, has_image: bool) -> Iterator[str]:
         """Route the request to appropriate agent(s)"""
         
         if input_type == "text_only":
             # Pure text processing
             self.log_action("Routing to Text Agent", "Processing text-only query")
-            return self.text_agent.process(user_input, image_data)
+            return self.text_agent.stream(user_input, image_data)
         
         elif input_type == "vision_primary":
             # Image-focused processing
             self.log_action("Routing to Vision Agent", "Processing image-focused query")
-            return self.vision_agent.process(user_input, image_data)
+            return self.vision_agent.stream(user_input, image_data)
         
         elif input_type == "vision_with_text":
             # Multi-modal processing - both image and complex text
-            self.log_action("Coordinating Multi-Modal Processing", "Using both Vision and Text agents")
+            self.log_action("Coordinating Multi-Modal Processing", "Running Vision and Text agents concurrently")
             
-            # First get vision analysis
-            vision_response = self.vision_agent.process(user_input, image_data)
+            vision_response, text_response = asyncio.run(self._agather_vision_and_text(user_input, image_data))
             
-            # Then enhance with text processing if needed
-            enhanced_query = f"Based on this image analysis: {vision_response}\n\nUser's additional question: {user_input}"
-            text_response = self.text_agent.process(enhanced_query)
-            
-            # Combine responses intelligently
-            combined_response = self._combine_responses(vision_response, text_response, user_input)
-            return combined_response
+            # Combine responses intelligently; only the synthesis step is streamed
+            return self._combine_responses(vision_response, text_response, user_input)
         
         else:
-            return "Unable to determine how to process this request."
+            return iter(["Unable to determine how to process this request."])
+    
+    async def _agather_vision_and_text(self, user_input: str, image_data: Optional[Any]) -> tuple:
+        """Run the vision pass and a text pass over the raw query concurrently"""
+        # The text pass reasons over the raw query, so it doesn't have to wait for vision
+        return await asyncio.gather(
+            self.vision_agent.aprocess(user_input, image_data),
+            self.text_agent.aprocess(user_input)
+        )
     
-    def _combine_responses(self, vision_response: str, text_response: str, original_query: str) -> str:
+    def _combine_responses(self, vision_response: str, text_response: str, original_query: str) -> Iterator[str]:
         """Combine vision and text responses intelligently"""
+        if not self._needs_synthesis(original_query, vision_response):
+            # The text pass never saw the image, so it adds nothing a covering vision answer lacks
+            self.log_action("Skipping synthesis", "Vision analysis already covers the query")
+            return iter([vision_response])
+        
         # Use the coordinator's ability to synthesize responses
-        synthesis_prompt = f"""
+        self.log_action("Synthesizing responses", "Merging vision and text analyses")
+        synthesis_prompt = self._build_synthesis_prompt(vision_response, text_response, original_query)
+        return self._stream_synthesis(synthesis_prompt, vision_response)
+    
+    def _stream_synthesis(self, synthesis_prompt: str, vision_response: str) -> Iterator[str]:
+        """Stream the synthesized answer, falling back to the vision answer if it fails up front"""
+        started = False
+        try:
+            for chunk in self.client.stream_text_response(synthesis_prompt):
+                if not started:
+                    yield "**Comprehensive Analysis:**\n\n"
+                    started = True
+                yield chunk
+        except Exception as e:
+            if started:
+                yield f"\n\nCoordinator error: {str(e)}"
+            else:
+                yield vision_response
+    
+    def _needs_synthesis(self, query: str, vision_response: str) -> bool:
+        """Cheap check for whether merging needs another LLM call"""
+        if len(vision_response) < self._SYNTHESIS_MIN_VISION_CHARS:
+            return True
+        
+        query_tokens = set(self._TOKEN_RE.findall(query.lower()))
+        if not query_tokens:
+            return False
+        
+        # Scan the vision response lazily and stop as soon as enough of the query is covered
+        required = math.ceil(len(query_tokens) * self._SYNTHESIS_MIN_OVERLAP)
+        missing = set(query_tokens)
+        for match in self._TOKEN_RE.finditer(vision_response.lower()):
+            missing.discard(match.group())
+            if len(query_tokens) - len(missing) >= required:
+                return False
+        return True
+    
+    def _build_synthesis_prompt(self, vision_response: str, text_response: str, original_query: str) -> str:
+        """Build the prompt used to merge vision and text responses"""
+        return f"""
         Original user query: {original_query}
         
         Vision Agent Analysis: {vision_response}
@@ -100,13 +176,6 @@ class CoordinatorAgent(BaseAgent):
         
         Please provide a coherent, comprehensive response that combines the visual analysis with the textual reasoning to best answer the user's query.
         """
-        
-        try:
-            synthesized = self.client.generate_text_response(synthesis_prompt)
-            return f"**Comprehensive Analysis:**\n\n{synthesized}"
-        except:
-            # Fallback to simple combination
-            return f"**Visual Analysis:**\n{vision_response}\n\n**Additional Analysis:**\n{text_response}"
     
     def _get_routing_info(self, input_type: str, has_image: bool) -> dict:
         """Get information about routing decision"""
@@ -130,27 +199,25 @@ class CoordinatorAgent(BaseAgent):
     
     def get_system_status(self) -> dict:
         """Get overall system status"""
-        return {
+        # The coordinator is shared across sessions, so the cache lives in session state
+        cached = self.state_manager.get_system_status_cache()
+        if cached is not None:
+            return cached
+        
+        status = {
             'coordinator': self.get_status(),
             'text_agent': self.text_agent.get_status(),
             'vision_agent': self.vision_agent.get_status(),
             'total_agents': 3,
-            'active_agents': sum([
-                1 if 'Active' in self.get_status() else 0,
-                1 if 'Active' in self.text_agent.get_status() else 0,
-                1 if 'Active' in self.vision_agent.get_status() else 0
-            ])
+            'active_agents': sum(agent.is_active() for agent in (self, self.text_agent, self.vision_agent))
         }
+        self.state_manager.set_system_status_cache(status)
+        return status
     
     def get_capabilities_summary(self) -> dict:
         """Get summary of all agent capabilities"""
-        return {
-            'coordinator': self.capabilities,
-            'text_agent': self.text_agent.capabilities,
-            'vision_agent': self.vision_agent.capabilities
-        }
+        return self._capabilities_summary
     
     def get_status(self) -> str:
         """Get coordinator status"""
-        state = self.get_state()
-        return "🟢 Active" if state.get('active', False) else "🔴 Inactive"
\ No newline at end of file
+        return "🟢 Active" if self.is_active() else "🔴 Inactive"
\ No newline at end of file
@@ -1,5 +1,5 @@
 from .base_agent import BaseAgent
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 import streamlit as st
 
 class TextAgent(BaseAgent):
@@ -19,28 +19,45 @@ class TextAgent(BaseAgent):
     
     def process(self, user_input: str, image_data: Optional[Any] = None) -> str:
         """Process text input and generate response"""
+        return "".join(self.stream(user_input, image_data))
+    
+    async def aprocess(self, user_input: str, image_data: Optional[Any] = None) -> str:
+        """Async variant of process, so text calls can overlap with other agents"""
+        try:
+            response = await self.client.generate_text_response_async(self._build_prompt(user_input))
+        except Exception as e:
+            return self._record_error(e)
+        self._record_response(user_input, response)
+        return response
+    
+    def stream(self, user_input: str, image_data: Optional[Any] = None) -> Iterator[str]:
+        """Stream the text response, updating state once it completes"""
+        chunks = []
         try:
-            # Get conversation context for better responses
-            context = self.state_manager.get_context()
-            
-            # Enhance prompt with context if available
-            enhanced_prompt = self._enhance_prompt(user_input, context)
-            
-            # Generate response using Gemini
-            response = self.client.generate_text_response(enhanced_prompt, context)
-            
-            # Update agent state
-            self.update_state({'last_response': response, 'active': True})
-            
-            # Update conversation context
-            self.state_manager.update_context(f"User asked: {user_input}\nAgent responded: {response[:200]}...")
-            
-            return response
-            
+            for chunk in self.client.stream_text_response(self._build_prompt(user_input)):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
-            error_msg = f"Error processing text input: {str(e)}"
-            self.update_state({'last_response': error_msg, 'active': False})
-            return error_msg
+            # Keep any partial answer readable, with the error after it
+            yield ("\n\n" if chunks else "") + self._record_error(e)
+            return
+        self._record_response(user_input, "".join(chunks))
+    
+    def _build_prompt(self, user_input: str) -> str:
+        """Build the full prompt; context is embedded here rather than passed to the client"""
+        context = self.state_manager.get_context()
+        return self._enhance_prompt(user_input, context)
+    
+    def _record_response(self, user_input: str, response: str):
+        """Update agent state and conversation context with a finished response"""
+        self.update_state({'last_response': response, 'active': True})
+        self.state_manager.update_context(f"User asked: {user_input}\nAgent responded: {response[:200]}...")
+    
+    def _record_error(self, error: Exception) -> str:
+        """Mark the agent inactive and return a user-facing error message"""
+        error_msg = f"Error processing text input: {str(error)}"
+        self.update_state({'last_response': error_msg, 'active': False})
+        return error_msg
     
     def _enhance_prompt(self, user_input: str, context: str) -> str:
         """Enhance user prompt with additional context and instructions"""
@@ -56,5 +73,4 @@ class TextAgent(BaseAgent):
     
     def get_status(self) -> str:
         """Get current agent status"""
-        state = self.get_state()
-        return "🟢 Active" if state.get('active', False) else "🔴 Inactive"
\ No newline at end of file
+        return "🟢 Active" if self.is_active() else "🔴 Inactive"
\ No newline at end of file
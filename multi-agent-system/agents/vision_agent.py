@@ -1,7 +1,15 @@
 from .base_agent import BaseAgent
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 import streamlit as st
-from PIL import Image
+import io
+from PIL import Image, ImageOps
+from utils.gemini_client import get_image_hash
+
+# Gemini downsamples large images internally, so anything bigger is wasted upload
+MAX_IMAGE_SIDE = 1024
+JPEG_QUALITY = 85
+
+NO_IMAGE_MESSAGE = "No image provided. Please upload an image for visual analysis."
 
 class VisionAgent(BaseAgent):
     def __init__(self, client, state_manager):
@@ -21,38 +29,60 @@ class VisionAgent(BaseAgent):
     
     def process(self, user_input: str, image_data: Optional[Any] = None) -> str:
         """Process image input and generate response"""
+        return "".join(self.stream(user_input, image_data))
+    
+    async def aprocess(self, user_input: str, image_data: Optional[Any] = None) -> str:
+        """Async variant of process, so vision calls can overlap with other agents"""
         try:
-            if image_data is None:
-                # Try to get the latest uploaded image
-                image_data = self.state_manager.get_latest_image()
-                
-            if image_data is None:
-                return "No image provided. Please upload an image for visual analysis."
-            
-            # Get conversation context
-            context = self.state_manager.get_context()
-            
-            # Enhance prompt for vision tasks
-            enhanced_prompt = self._enhance_vision_prompt(user_input, context)
-            
-            # Process image - ensure it's in correct format
-            processed_image = self._process_image(image_data)
-            
-            # Generate response using Gemini Vision
-            response = self.client.generate_vision_response(enhanced_prompt, processed_image, context)
-            
-            # Update agent state
-            self.update_state({'last_response': response, 'active': True})
-            
-            # Update conversation context
-            self.state_manager.update_context(f"User asked about image: {user_input}\nVision analysis: {response[:200]}...")
-            
-            return response
-            
+            request = self._prepare_request(user_input, image_data)
+            if request is None:
+                return NO_IMAGE_MESSAGE
+            response = await self.client.generate_vision_response_async(*request)
         except Exception as e:
-            error_msg = f"Error processing image: {str(e)}"
-            self.update_state({'last_response': error_msg, 'active': False})
-            return error_msg
+            return self._record_error(e)
+        self._record_response(user_input, response)
+        return response
+    
+    def stream(self, user_input: str, image_data: Optional[Any] = None) -> Iterator[str]:
+        """Stream the vision response, updating state once it completes"""
+        chunks = []
+        try:
+            request = self._prepare_request(user_input, image_data)
+            if request is None:
+                yield NO_IMAGE_MESSAGE
+                return
+            for chunk in self.client.stream_vision_response(*request):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            # Keep any partial answer readable, with the error after it
+            yield ("\n\n" if chunks else "") + self._record_error(e)
+            return
+        self._record_response(user_input, "".join(chunks))
+    
+    def _prepare_request(self, user_input: str, image_data: Optional[Any]) -> Optional[tuple]:
+        """Resolve the image and build the prompt; returns None when no image is available"""
+        if image_data is None:
+            # Try to get the latest uploaded image
+            image_data = self.state_manager.get_latest_image()
+        if image_data is None:
+            return None
+        
+        # Context is embedded in the prompt rather than passed to the client
+        context = self.state_manager.get_context()
+        enhanced_prompt = self._enhance_vision_prompt(user_input, context)
+        return enhanced_prompt, self._process_image(image_data)
+    
+    def _record_response(self, user_input: str, response: str):
+        """Update agent state and conversation context with a finished response"""
+        self.update_state({'last_response': response, 'active': True})
+        self.state_manager.update_context(f"User asked about image: {user_input}\nVision analysis: {response[:200]}...")
+    
+    def _record_error(self, error: Exception) -> str:
+        """Mark the agent inactive and return a user-facing error message"""
+        error_msg = f"Error processing image: {str(error)}"
+        self.update_state({'last_response': error_msg, 'active': False})
+        return error_msg
     
     def _enhance_vision_prompt(self, user_input: str, context: str) -> str:
         """Enhance user prompt for vision-specific tasks"""
@@ -73,20 +103,44 @@ class VisionAgent(BaseAgent):
         """Process image data to ensure it's in the correct format for Gemini"""
         try:
             if isinstance(image_data, Image.Image):
-                return image_data
+                image = image_data
             elif hasattr(image_data, 'read'):
                 # It's a file-like object
-                return Image.open(image_data)
+                image = Image.open(image_data)
             else:
                 # Assume it's already processed
                 return image_data
+            
+            # Reruns pass the same decoded image, so reuse the last result for identical pixels
+            image_hash = get_image_hash(image)
+            processed = self.state_manager.get_processed_image(image_hash)
+            if processed is None:
+                processed = self._downscale_image(image)
+                self.state_manager.set_processed_image(image_hash, processed)
+            return processed
         except Exception as e:
             raise Exception(f"Unable to process image: {str(e)}")
     
+    def _downscale_image(self, image: Image.Image) -> Image.Image:
+        """Shrink the image to MAX_IMAGE_SIDE and re-encode it as JPEG to cut upload size"""
+        if image.format == 'JPEG' and max(image.size) <= MAX_IMAGE_SIDE:
+            # Already small and compressed
+            return image
+        
+        if max(image.size) > MAX_IMAGE_SIDE:
+            # contain() returns a new image, leaving the caller's copy untouched
+            image = ImageOps.contain(image, (MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+        buffer.seek(0)
+        return Image.open(buffer)
+    
     def get_status(self) -> str:
         """Get current agent status"""
-        state = self.get_state()
-        return "🟢 Active" if state.get('active', False) else "🔴 Inactive"
+        return "🟢 Active" if self.is_active() else "🔴 Inactive"
     
     def analyze_image_content(self, image_data: Any) -> str:
         """Perform general image analysis"""
@@ -1,10 +1,7 @@
-import os
-from dotenv import load_dotenv
-
 import streamlit as st
-import os
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 from PIL import Image
-import io
+import pandas as pd
 
 # Import our custom modules
 from utils.gemini_client import GeminiClient
@@ -19,17 +16,31 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_gemini_client():
+    """Create the Gemini client once per server process"""
+    return GeminiClient()
+
+@st.cache_resource
+def get_coordinator(_client):
+    """Create the coordinator once per server process"""
+    return CoordinatorAgent(_client, StateManager())
+
+@st.cache_data(show_spinner=False, hash_funcs={UploadedFile: lambda f: f.file_id}, max_entries=8)
+def _decode_upload(uploaded_file) -> Image.Image:
+    """Decode an uploaded image once per distinct upload rather than once per rerun"""
+    image = Image.open(uploaded_file)
+    image.load()
+    return image
+
 def initialize_system():
     """Initialize the multi-agent system"""
     if 'system_initialized' not in st.session_state:
         try:
-            # Initialize components
-            st.session_state.gemini_client = GeminiClient()
+            # Initialize components; StateManager stays per-session since it seeds st.session_state
+            st.session_state.gemini_client = get_gemini_client()
             st.session_state.state_manager = StateManager()
-            st.session_state.coordinator = CoordinatorAgent(
-                st.session_state.gemini_client,
-                st.session_state.state_manager
-            )
+            st.session_state.coordinator = get_coordinator(st.session_state.gemini_client)
             st.session_state.system_initialized = True
         except Exception as e:
             st.error(f"Failed to initialize system: {str(e)}")
@@ -48,51 +59,57 @@ def display_header():
             st.session_state.state_manager.clear_history()
             st.rerun()
     with col3:
-        st.markdown(f"**Messages:** {len(st.session_state.state_manager.get_recent_history(1000))}")
+        st.markdown(f"**Messages:** {st.session_state.state_manager.get_history_length()}")
 
 def display_sidebar():
     """Display sidebar with system information"""
     with st.sidebar:
-        st.header("📊 System Status")
-        
-        # Get system status
-        coordinator = st.session_state.coordinator
-        status = coordinator.get_system_status()
-        
-        # Display agent status
-        st.subheader("🤖 Agents")
-        st.write(f"**Coordinator:** {status['coordinator']}")
-        st.write(f"**Text Agent:** {status['text_agent']}")
-        st.write(f"**Vision Agent:** {status['vision_agent']}")
-        
-        st.markdown("---")
-        
-        # Display capabilities
-        st.subheader("⚡ Capabilities")
-        capabilities = coordinator.get_capabilities_summary()
-        
-        with st.expander("📝 Text Agent"):
-            for cap in capabilities['text_agent']:
-                st.write(f"• {cap}")
-        
-        with st.expander("👁️ Vision Agent"):
-            for cap in capabilities['vision_agent']:
-                st.write(f"• {cap}")
-        
-        with st.expander("🎯 Coordinator"):
-            for cap in capabilities['coordinator']:
-                st.write(f"• {cap}")
-        
-        st.markdown("---")
-        
-        # Display recent context
-        st.subheader("💭 Context")
-        context = st.session_state.state_manager.get_context()
-        if context:
-            st.text_area("Current Context", context, height=100, disabled=True)
-        else:
-            st.write("*No context available*")
+        display_system_status()
 
+# Fragments can't open st.sidebar themselves, so the sidebar body lives here
+@st.fragment
+def display_system_status():
+    """Display agent status, capabilities and context"""
+    st.header("📊 System Status")
+    
+    # Get system status
+    coordinator = st.session_state.coordinator
+    status = coordinator.get_system_status()
+    
+    # Display agent status
+    st.subheader("🤖 Agents")
+    st.markdown(
+        f"**Coordinator:** {status['coordinator']}  \n"
+        f"**Text Agent:** {status['text_agent']}  \n"
+        f"**Vision Agent:** {status['vision_agent']}"
+    )
+    
+    st.markdown("---")
+    
+    # Display capabilities
+    st.subheader("⚡ Capabilities")
+    capabilities = coordinator.get_capabilities_summary()
+    
+    with st.expander("📝 Text Agent"):
+        st.markdown("  \n".join(f"• {cap}" for cap in capabilities['text_agent']))
+    
+    with st.expander("👁️ Vision Agent"):
+        st.markdown("  \n".join(f"• {cap}" for cap in capabilities['vision_agent']))
+    
+    with st.expander("🎯 Coordinator"):
+        st.markdown("  \n".join(f"• {cap}" for cap in capabilities['coordinator']))
+    
+    st.markdown("---")
+    
+    # Display recent context
+    st.subheader("💭 Context")
+    context = st.session_state.state_manager.get_context()
+    if context:
+        st.text_area("Current Context", context, height=100, disabled=True)
+    else:
+        st.write("*No context available*")
+
+@st.fragment
 def display_conversation_history():
     """Display conversation history"""
     history = st.session_state.state_manager.get_recent_history(10)
@@ -100,19 +117,30 @@ def display_conversation_history():
     if history:
         st.subheader("💬 Recent Conversation")
         
-        for i, interaction in enumerate(reversed(history)):
-            with st.container():
-                col1, col2 = st.columns([1, 4])
-                with col1:
-                    st.write(f"**{interaction['agent_type']}**")
-                    if interaction['has_image']:
-                        st.write("🖼️ *With Image*")
-                
-                with col2:
-                    st.write(f"**User:** {interaction['user_input']}")
-                    st.write(f"**Response:** {interaction['agent_response'][:200]}...")
-                
-                st.markdown("---")
+        # Newest first, rendered as a single table element
+        history = list(reversed(history))
+        df = pd.DataFrame.from_records(history)[['agent_type', 'has_image', 'user_input', 'agent_response']]
+        df['agent_response'] = df['agent_response'].str.slice(0, 200) + '...'
+        st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'agent_type': 'Agent',
+                'has_image': '🖼️ Image',
+                'user_input': 'User',
+                'agent_response': 'Response'
+            }
+        )
+        
+        with st.expander("🔍 Full response"):
+            # Runs inside the fragment, so picking an entry doesn't rerun the whole app
+            index = st.selectbox(
+                "Interaction",
+                range(len(history)),
+                format_func=lambda i: f"{history[i]['agent_type']}: {history[i]['user_input'][:60]}"
+            )
+            st.markdown(history[index]['agent_response'])
 
 def handle_user_input():
     """Handle user input processing"""
@@ -122,69 +150,72 @@ def handle_user_input():
     # Create input section
     st.subheader("💭 Ask Me Anything")
     
-    # File uploader for images
-    uploaded_file = st.file_uploader(
-        "Upload an image (optional)",
-        type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
-        help="Upload an image for visual analysis"
-    )
-    
-    # Text input
-    user_input = st.text_area(
-        "Your question or message:",
-        placeholder="Ask about the image, request analysis, or ask any question...",
-        height=100
-    )
+    # Widgets inside the form only trigger a rerun on submit, not on every edit
+    with st.form("query_form", clear_on_submit=False):
+        # File uploader for images
+        uploaded_file = st.file_uploader(
+            "Upload an image (optional)",
+            type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
+            help="Upload an image for visual analysis"
+        )
+        
+        # Text input
+        user_input = st.text_area(
+            "Your question or message:",
+            placeholder="Ask about the image, request analysis, or ask any question...",
+            height=100
+        )
+        
+        # Process button
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            process_button = st.form_submit_button("🚀 Process", type="primary")
+        with col2:
+            reset_button = st.form_submit_button("🔄 Reset Input")
     
-    # Process button
-    col1, col2, col3 = st.columns([1, 1, 2])
-    with col1:
-        process_button = st.button("🚀 Process", type="primary")
-    with col2:
-        if st.button("🔄 Reset Input"):
-            st.rerun()
+    if reset_button:
+        st.rerun()
     
     # Handle processing
     if process_button and (user_input.strip() or uploaded_file):
-        with st.spinner("🤖 Processing your request..."):
-            try:
+        try:
+            with st.spinner("🤖 Processing your request..."):
                 # Process uploaded image
                 image_data = None
                 if uploaded_file:
-                    image_data = Image.open(uploaded_file)
+                    image_data = _decode_upload(uploaded_file)
                     state_manager.add_uploaded_image(image_data)
                     
                     # Display uploaded image
                     st.image(image_data, caption="Uploaded Image")
                 
-                # Process the request
-                response = coordinator.process(user_input, image_data)
-                
-                # Determine agent type used
-                agent_type = "Coordinator"
-                if hasattr(coordinator, 'get_state'):
-                    state = coordinator.get_state()
-                    last_decision = state.get('last_decision', '')
-                    if 'text' in last_decision:
-                        agent_type = "Text Agent"
-                    elif 'vision' in last_decision:
-                        agent_type = "Vision Agent"
-                
-                # Add to history
-                state_manager.add_to_history(
-                    user_input, 
-                    response, 
-                    agent_type, 
-                    image_data
-                )
-                
-                # Display response
-                st.success("✅ Response Generated!")
-                st.markdown("### 🤖 Agent Response:")
-                st.markdown(response)
-                
-            except Exception as e:
-                st.error(f"❌ Error processing request: {str(e)}")
+                # Route the request; the answer itself is streamed below
+                chunks = coordinator.stream(user_input, image_data)
+            
+            # Display response as it is generated
+            st.markdown("### 🤖 Agent Response:")
+            response = st.write_stream(chunks)
+            
+            # Determine agent type used
+            agent_type = "Coordinator"
+            if hasattr(coordinator, 'get_state'):
+                # A single agent is credited directly; multi-agent turns stay with the coordinator
+                agents_used = coordinator.get_state().last_routing.get('agents_used', [])
+                if len(agents_used) == 1:
+                    agent_type = agents_used[0]
+            
+            # Add to history
+            state_manager.add_to_history(
+                user_input, 
+                response, 
+                agent_type, 
+                image_data
+            )
+            
+            st.success("✅ Response Generated!")
+            
+        except Exception as e:
+            st.error(f"❌ Error processing request: {str(e)}")
     
     elif process_button:
         st.warning("⚠️ Please provide either text input or upload an image.")
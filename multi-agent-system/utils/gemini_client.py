@@ -1,15 +1,79 @@
 import os
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
 import google.generativeai as genai
-from dotenv import load_dotenv
 import streamlit as st
 
-# Load the .env file
-load_dotenv()
+@st.cache_resource
+def _dotenv_loaded() -> bool:
+    """Load the .env file once per server process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+# Cached responses expire after a day; the oldest are dropped beyond CACHE_SIZE
+CACHE_TTL = 24 * 60 * 60
+CACHE_SIZE = 256
+
+_response_store_lock = threading.Lock()
+
+@st.cache_resource
+def _response_store() -> "OrderedDict[tuple, tuple]":
+    """Responses shared across sessions: (prompt, context, image_hash) -> (expires_at, text)"""
+    return OrderedDict()
+
+# id(image) -> (weakref to image, sha256 of its pixels)
+_image_hashes = {}
+
+def _build_prompt(prompt, context=""):
+    return f"Context: {context}\n\nQuery: {prompt}" if context else prompt
+
+def get_image_hash(image):
+    """Hash an image's pixels once per distinct PIL image object"""
+    key = id(image)
+    entry = _image_hashes.get(key)
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+
+    digest = hashlib.sha256(f"{image.mode}:{image.size}:".encode())
+    digest.update(image.tobytes())
+    image_hash = digest.hexdigest()
+    _image_hashes[key] = (weakref.ref(image, lambda _, key=key: _image_hashes.pop(key, None)), image_hash)
+    return image_hash
+
+def _cache_get(prompt, context="", image_hash=None):
+    key = (prompt, context, image_hash)
+    store = _response_store()
+    with _response_store_lock:
+        entry = store.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return entry[1]
+
+def _cache_put(prompt, context, image_hash, text):
+    key = (prompt, context, image_hash)
+    store = _response_store()
+    with _response_store_lock:
+        store[key] = (time.monotonic() + CACHE_TTL, text)
+        store.move_to_end(key)
+        while len(store) > CACHE_SIZE:
+            store.popitem(last=False)
 
 class GeminiClient:
     def __init__(self):
-        # Load API key from environment
+        # Load API key from environment, falling back to the .env file
         api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            _dotenv_loaded()
+            api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
             st.error("Gemini API key not found. Please set GEMINI_API_KEY in the .env file.")
             st.stop()
@@ -22,18 +86,51 @@ class GeminiClient:
         self.text_model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
         self.vision_model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
     
+    # Failures propagate to the calling agent, which decides what the user sees
     def generate_text_response(self, prompt, context=""):
-        try:
-            full_prompt = f"Context: {context}\n\nQuery: {prompt}" if context else prompt
-            response = self.text_model.generate_content(full_prompt)
-            return response.text
-        except Exception as e:
-            return f"Error generating text response: {str(e)}"
+        text = _cache_get(prompt, context)
+        if text is None:
+            text = self.text_model.generate_content(_build_prompt(prompt, context)).text
+            _cache_put(prompt, context, None, text)
+        return text
     
     def generate_vision_response(self, prompt, image, context=""):
-        try:
-            full_prompt = f"Context: {context}\n\nQuery: {prompt}" if context else prompt
-            response = self.vision_model.generate_content([full_prompt, image])
-            return response.text
-        except Exception as e:
-            return f"Error generating vision response: {str(e)}"
+        image_hash = get_image_hash(image)
+        text = _cache_get(prompt, context, image_hash)
+        if text is None:
+            text = self.vision_model.generate_content([_build_prompt(prompt, context), image]).text
+            _cache_put(prompt, context, image_hash, text)
+        return text
+    
+    # The blocking calls run in worker threads rather than through generate_content_async:
+    # the SDK caches its async gRPC client on the event loop that first used it, and each
+    # asyncio.run() in the coordinator gets a fresh loop that is closed afterwards
+    async def generate_text_response_async(self, prompt, context=""):
+        return await asyncio.to_thread(self.generate_text_response, prompt, context)
+    
+    async def generate_vision_response_async(self, prompt, image, context=""):
+        return await asyncio.to_thread(self.generate_vision_response, prompt, image, context)
+    
+    def stream_text_response(self, prompt, context=""):
+        return self._stream_cached(self.text_model, _build_prompt(prompt, context), prompt, context)
+    
+    def stream_vision_response(self, prompt, image, context=""):
+        return self._stream_cached(
+            self.vision_model, [_build_prompt(prompt, context), image], prompt, context, get_image_hash(image)
+        )
+    
+    def _stream_cached(self, model, contents, prompt, context, image_hash=None):
+        """Yield a cached response as one chunk, otherwise stream it and cache the joined text.
+        
+        A failed stream raises after any chunks already yielded and is never cached.
+        """
+        cached = _cache_get(prompt, context, image_hash)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        for chunk in model.generate_content(contents, stream=True):
+            chunks.append(chunk.text)
+            yield chunk.text
+        _cache_put(prompt, context, image_hash, "".join(chunks))
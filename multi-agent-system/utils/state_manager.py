@@ -1,28 +1,66 @@
 import streamlit as st
+import itertools
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from PIL import Image, ImageOps
+from .gemini_client import get_image_hash
+
+# Maximum number of interactions kept in conversation history
+MAX_HISTORY = 200
+
+# Context keeps the last few fragments, trimmed to MAX_CONTEXT_CHARS when read
+MAX_CONTEXT_FRAGMENTS = 10
+MAX_CONTEXT_CHARS = 1000
+
+# Full-resolution images kept process-wide; sessions only hold hashes and thumbnails
+IMAGE_STORE_SIZE = 16
+THUMBNAIL_SIZE = (256, 256)
+
+_image_store_lock = threading.Lock()
+
+@st.cache_resource
+def _image_store() -> "OrderedDict[str, Image.Image]":
+    """LRU of uploaded images shared across sessions, keyed by image hash"""
+    return OrderedDict()
+
+@dataclass(slots=True)
+class AgentState:
+    """Per-agent state stored in st.session_state.agent_states"""
+    active: bool = True
+    last_response: str = ""
+    last_decision: str = ""
+    last_routing: dict = field(default_factory=dict)
 
 class StateManager:
+    # Holds no instance state: everything lives in st.session_state, so an instance
+    # shared across sessions (e.g. by the cached coordinator) always acts on the caller's session
     def __init__(self):
         self.initialize_session_state()
     
     def initialize_session_state(self):
         """Initialize session state variables"""
         if 'conversation_history' not in st.session_state:
-            st.session_state.conversation_history = []
+            st.session_state.conversation_history = deque(maxlen=MAX_HISTORY)
         
-        if 'current_context' not in st.session_state:
-            st.session_state.current_context = ""
+        if 'current_context_frags' not in st.session_state:
+            self._reset_context()
         
         if 'uploaded_images' not in st.session_state:
-            st.session_state.uploaded_images = []
+            st.session_state.uploaded_images = deque(maxlen=IMAGE_STORE_SIZE)
         
         if 'agent_states' not in st.session_state:
             st.session_state.agent_states = {
-                'text_agent': {'active': True, 'last_response': ''},
-                'vision_agent': {'active': True, 'last_response': ''},
-                'coordinator': {'active': True, 'last_decision': ''}
+                'text_agent': AgentState(),
+                'vision_agent': AgentState(),
+                'coordinator_agent': AgentState()
             }
+        
+        # Bumped on every agent state change so derived views can be cached
+        if 'agent_state_version' not in st.session_state:
+            st.session_state.agent_state_version = 0
     
     def add_to_history(self, user_input: str, agent_response: str, agent_type: str, image_data: Optional[Any] = None):
         """Add interaction to conversation history"""
@@ -37,47 +75,109 @@ class StateManager:
     
     def update_context(self, new_context: str):
         """Update current context with new information"""
-        if st.session_state.current_context:
-            st.session_state.current_context += f"\n{new_context}"
-        else:
-            st.session_state.current_context = new_context
-        
-        # Keep context manageable (last 1000 characters)
-        if len(st.session_state.current_context) > 1000:
-            st.session_state.current_context = st.session_state.current_context[-1000:]
+        st.session_state.current_context_frags.append(new_context)
+        st.session_state.context_version += 1
     
     def get_context(self) -> str:
         """Get current conversation context"""
-        return st.session_state.current_context
+        # Join lazily, and only once per context change
+        version, context = st.session_state.context_cache
+        if version != st.session_state.context_version:
+            # Keep context manageable (last MAX_CONTEXT_CHARS characters)
+            context = "\n".join(st.session_state.current_context_frags)[-MAX_CONTEXT_CHARS:]
+            st.session_state.context_cache = (st.session_state.context_version, context)
+        return context
+    
+    def _reset_context(self):
+        """Start an empty context"""
+        st.session_state.current_context_frags = deque(maxlen=MAX_CONTEXT_FRAGMENTS)
+        st.session_state.context_version = 0
+        st.session_state.context_cache = (0, "")
     
     def get_recent_history(self, limit: int = 5) -> List[Dict]:
         """Get recent conversation history"""
-        return st.session_state.conversation_history[-limit:] if st.session_state.conversation_history else []
+        # Walk from the right end so only `limit` entries are touched
+        recent = list(itertools.islice(reversed(st.session_state.conversation_history), limit))
+        recent.reverse()
+        return recent
+    
+    def get_history_length(self) -> int:
+        """Get number of interactions in conversation history"""
+        return len(st.session_state.conversation_history)
     
     def clear_history(self):
         """Clear conversation history and context"""
-        st.session_state.conversation_history = []
-        st.session_state.current_context = ""
-        st.session_state.uploaded_images = []
+        st.session_state.conversation_history = deque(maxlen=MAX_HISTORY)
+        self._reset_context()
+        st.session_state.uploaded_images = deque(maxlen=IMAGE_STORE_SIZE)
     
     def update_agent_state(self, agent_name: str, state_data: Dict[str, Any]):
         """Update specific agent state"""
-        if agent_name in st.session_state.agent_states:
-            st.session_state.agent_states[agent_name].update(state_data)
+        state = self.get_agent_state(agent_name)
+        for key, value in state_data.items():
+            setattr(state, key, value)
+        st.session_state.agent_state_version += 1
     
-    def get_agent_state(self, agent_name: str) -> Dict[str, Any]:
+    def get_agent_state(self, agent_name: str) -> AgentState:
         """Get specific agent state"""
-        return st.session_state.agent_states.get(agent_name, {})
+        states = st.session_state.agent_states
+        state = states.get(agent_name)
+        if state is None:
+            state = states[agent_name] = AgentState()
+        return state
+    
+    def get_system_status_cache(self) -> Optional[Dict[str, Any]]:
+        """Get the cached system status if agent state hasn't changed since it was stored"""
+        cached = st.session_state.get('system_status_cache')
+        if cached is not None and cached[0] == st.session_state.agent_state_version:
+            return cached[1]
+        return None
+    
+    def set_system_status_cache(self, status: Dict[str, Any]):
+        """Cache the system status against the current agent state version"""
+        st.session_state.system_status_cache = (st.session_state.agent_state_version, status)
+    
+    def get_processed_image(self, image_hash: str) -> Optional[Image.Image]:
+        """Get the model-ready copy of an image if it was the last one processed"""
+        cached = st.session_state.get('processed_image')
+        if cached is not None and cached[0] == image_hash:
+            return cached[1]
+        return None
+    
+    def set_processed_image(self, image_hash: str, image: Image.Image):
+        """Remember the model-ready copy of the last processed image"""
+        st.session_state.processed_image = (image_hash, image)
     
     def add_uploaded_image(self, image_data: Any):
         """Add uploaded image to state"""
+        image_hash = get_image_hash(image_data)
+        
+        store = _image_store()
+        with _image_store_lock:
+            store[image_hash] = image_data
+            store.move_to_end(image_hash)
+            while len(store) > IMAGE_STORE_SIZE:
+                store.popitem(last=False)
+        
+        # contain() resizes straight from the source instead of copying the full bitmap first
+        thumbnail = image_data
+        if image_data.width > THUMBNAIL_SIZE[0] or image_data.height > THUMBNAIL_SIZE[1]:
+            thumbnail = ImageOps.contain(image_data, THUMBNAIL_SIZE)
         st.session_state.uploaded_images.append({
             'timestamp': datetime.now().isoformat(),
-            'image': image_data
+            'hash': image_hash,
+            'thumbnail': thumbnail
         })
     
     def get_latest_image(self) -> Optional[Any]:
         """Get the most recently uploaded image"""
         if st.session_state.uploaded_images:
-            return st.session_state.uploaded_images[-1]['image']
+            latest = st.session_state.uploaded_images[-1]
+            store = _image_store()
+            with _image_store_lock:
+                image = store.get(latest['hash'])
+                if image is not None:
+                    store.move_to_end(latest['hash'])
+            # Once evicted, report no image rather than sending the low-res thumbnail to the model
+            return image
         return None
\ No newline at end of file